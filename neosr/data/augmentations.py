@@ -1,3 +1,4 @@
+import math
 import random
 
 import numpy as np
@@ -10,9 +11,25 @@ from neosr.utils.rng import rng
 rng = rng()
 
 
+def _resize(
+    img: Tensor,
+    size: tuple[int, int] | None = None,
+    scale_factor: float | None = None,
+    mode: str = "bicubic",
+) -> Tensor:
+    """Antialiased resize, clamped to [0, 1]."""
+    return F.interpolate(
+        img, size=size, scale_factor=scale_factor, mode=mode, antialias=True
+    ).clamp_(0, 1)
+
+
 @torch.no_grad()
 def mixup(
-    img_gt: Tensor, img_lq: Tensor, alpha_min: float = 0.4, alpha_max: float = 0.6
+    img_gt: Tensor,
+    img_lq: Tensor,
+    alpha_min: float = 0.4,
+    alpha_max: float = 0.6,
+    rand_index: Tensor | None = None,
 ) -> tuple[Tensor, Tensor]:
     r"""MixUp augmentation.
 
@@ -25,6 +42,8 @@ def mixup(
         img_gt, img_lq (Tensor): Input images of shape (N, C, H, W).
             Assumes same size.
         alpha_min/max (float): The given min/max mixing ratio.
+        rand_index (Tensor, optional): Batch permutation to mix with.
+            Default: None, draws a new one.
 
     """
     if img_gt.size() != img_lq.size():
@@ -34,17 +53,24 @@ def mixup(
     lam = rng.uniform(alpha_min, alpha_max)  # type: ignore[attr-defined]
 
     # mixup process
-    rand_index = torch.randperm(img_gt.size(0))
-    img_ = img_gt[rand_index]
+    if rand_index is None:
+        rand_index = torch.randperm(img_gt.size(0), device=img_gt.device)
 
-    img_gt = lam * img_gt + (1 - lam) * img_
-    img_lq = lam * img_lq + (1 - lam) * img_
+    # fused in-place lerp: lam * img + (1 - lam) * img[rand_index]
+    img_gt.lerp_(img_gt.index_select(0, rand_index), 1.0 - lam)
+    img_lq.lerp_(img_lq.index_select(0, rand_index), 1.0 - lam)
 
     return img_gt, img_lq
 
 
 @torch.no_grad()
-def cutmix(img_gt: Tensor, img_lq: Tensor, alpha: float = 0.9) -> tuple[Tensor, Tensor]:
+def cutmix(
+    img_gt: Tensor,
+    img_lq: Tensor,
+    alpha: float = 0.9,
+    scale: int = 1,
+    rand_index: Tensor | None = None,
+) -> tuple[Tensor, Tensor]:
     r"""CutMix augmentation.
 
     "CutMix: Regularization Strategy to Train Strong Classifiers with
@@ -54,50 +80,60 @@ def cutmix(img_gt: Tensor, img_lq: Tensor, alpha: float = 0.9) -> tuple[Tensor,
     Args:
     ----
         img_gt, img_lq (Tensor): Input images of shape (N, C, H, W).
-            Assumes same size.
+            img_gt has to be `scale` times the size of img_lq.
         alpha (float): The given maximum mixing ratio.
+        scale (int): Scale ratio between GT and LQ. Default: 1
+        rand_index (Tensor, optional): Batch permutation to mix with.
+            Default: None, draws a new one.
 
     """
-    if img_gt.size() != img_lq.size():
-        msg = "img_gt and img_lq have to be the same resolution."
+    if img_gt.shape[2:] != torch.Size(s * scale for s in img_lq.shape[2:]):
+        msg = "img_gt has to be scale times the resolution of img_lq."
         raise ValueError(msg)
 
     def rand_bbox(size, lam):
         """Generate random box by lam."""
         W = size[2]
         H = size[3]
-        cut_rat = np.sqrt(1.0 - lam)
+        cut_rat = math.sqrt(1.0 - lam)
         cut_w = int(W * cut_rat)
         cut_h = int(H * cut_rat)
 
         # uniform
-        cx = rng.integers(W)  # type: ignore[attr-defined]
-        cy = rng.integers(H)  # type: ignore[attr-defined]
+        cx = int(rng.integers(W))  # type: ignore[attr-defined]
+        cy = int(rng.integers(H))  # type: ignore[attr-defined]
 
-        bbx1 = np.clip(cx - cut_w // 2, 0, W)
-        bby1 = np.clip(cy - cut_h // 2, 0, H)
-        bbx2 = np.clip(cx + cut_w // 2, 0, W)
-        bby2 = np.clip(cy + cut_h // 2, 0, H)
+        bbx1 = min(max(cx - cut_w // 2, 0), W)
+        bby1 = min(max(cy - cut_h // 2, 0), H)
+        bbx2 = min(max(cx + cut_w // 2, 0), W)
+        bby2 = min(max(cy + cut_h // 2, 0), H)
 
         return bbx1, bby1, bbx2, bby2
 
     lam = rng.uniform(0, alpha)  # type: ignore[attr-defined]
-    rand_index = torch.randperm(img_gt.size(0))
-
-    # mixup process
-    img_gt_ = img_gt[rand_index]
-    img_lq_ = img_lq[rand_index]
-    bbx1, bby1, bbx2, bby2 = rand_bbox(img_gt.size(), lam)
-    img_gt[:, :, bbx1:bbx2, bby1:bby2] = img_gt_[:, :, bbx1:bbx2, bby1:bby2]
-    img_lq[:, :, bbx1:bbx2, bby1:bby2] = img_lq_[:, :, bbx1:bbx2, bby1:bby2]
+    if rand_index is None:
+        rand_index = torch.randperm(img_gt.size(0), device=img_gt.device)
+
+    # mixup process, box drawn on the lq grid. Only the box is
+    # gathered from the shuffled batch and copied back in place.
+    bbx1, bby1, bbx2, bby2 = rand_bbox(img_lq.size(), lam)
+    for img, s in ((img_lq, 1), (img_gt, scale)):
+        box = img.narrow(2, bbx1 * s, (bbx2 - bbx1) * s).narrow(
+            3, bby1 * s, (bby2 - bby1) * s
+        )
+        box.copy_(box.index_select(0, rand_index))
 
     return img_gt, img_lq
 
 
 @torch.no_grad()
 def resizemix(
-    img_gt: Tensor, img_lq: Tensor, scope: tuple[float, float] = (0.2, 0.9), 
-    x_axis_only: bool = False, y_axis_only: bool = False
+    img_gt: Tensor,
+    img_lq: Tensor,
+    scope: tuple[float, float] = (0.2, 0.9),
+    x_axis_only: bool = False,
+    y_axis_only: bool = False,
+    rand_index: Tensor | None = None,
 ) -> tuple[Tensor, Tensor]:
     r"""ResizeMix augmentation.
 
@@ -111,6 +147,8 @@ def resizemix(
         scope (float): The given maximum mixing ratio.
         x_axis_only: Scale only on x axis
         y_axis_only: Scale only on y axis
+        rand_index (Tensor, optional): Batch permutation to mix with.
+            Default: None, draws a new one.
 
     """
     if img_gt.size() != img_lq.size():
@@ -129,22 +167,21 @@ def resizemix(
         cut_h = int(H * tao)
 
         # uniform
-        cx = rng.integers(W)  # type: ignore[attr-defined]
-        cy = rng.integers(H)  # type: ignore[attr-defined]
+        cx = int(rng.integers(W))  # type: ignore[attr-defined]
+        cy = int(rng.integers(H))  # type: ignore[attr-defined]
 
-        bbx1 = 0 if y_axis_only else np.clip(cx - cut_w // 2, 0, W)
-        bby1 = 0 if x_axis_only else np.clip(cy - cut_h // 2, 0, H)
-        bbx2 = W if y_axis_only else np.clip(cx + cut_w // 2, 0, W)
-        bby2 = H if x_axis_only else np.clip(cy + cut_h // 2, 0, H)
+        bbx1 = 0 if y_axis_only else min(max(cx - cut_w // 2, 0), W)
+        bby1 = 0 if x_axis_only else min(max(cy - cut_h // 2, 0), H)
+        bbx2 = W if y_axis_only else min(max(cx + cut_w // 2, 0), W)
+        bby2 = H if x_axis_only else min(max(cy + cut_h // 2, 0), H)
 
         return bbx1, bby1, bbx2, bby2
 
     # index
-    rand_index = torch.randperm(img_gt.size(0))
-    img_gt_resize = img_gt.clone()
-    img_gt_resize = img_gt_resize[rand_index]
-    img_lq_resize = img_lq.clone()
-    img_lq_resize = img_lq_resize[rand_index]
+    if rand_index is None:
+        rand_index = torch.randperm(img_gt.size(0), device=img_gt.device)
+    img_gt_resize = img_gt.index_select(0, rand_index)
+    img_lq_resize = img_lq.index_select(0, rand_index)
 
     # generate tao
     tao = rng.uniform(scope[0], scope[1])  # type: ignore[attr-defined]
@@ -152,21 +189,11 @@ def resizemix(
     # random box
     bbx1, bby1, bbx2, bby2 = rand_bbox_tao(img_gt.size(), tao)
 
-    # resize
-    img_gt_resize = torch.clamp(
-        F.interpolate(
-            img_gt_resize, (bby2 - bby1, bbx2 - bbx1), mode="bicubic", antialias=True
-        ),
-        0,
-        1,
-    )
-    img_lq_resize = torch.clamp(
-        F.interpolate(
-            img_lq_resize, (bby2 - bby1, bbx2 - bbx1), mode="bicubic", antialias=True
-        ),
-        0,
-        1,
+    # resize gt and lq in a single call
+    img_resize = _resize(
+        torch.cat((img_gt_resize, img_lq_resize), dim=0), (bby2 - bby1, bbx2 - bbx1)
     )
+    img_gt_resize, img_lq_resize = img_resize.split(img_gt.size(0), dim=0)
 
     # mix
     img_gt[:, :, bby1:bby2, bbx1:bbx2] = img_gt_resize
@@ -177,7 +204,7 @@ def resizemix(
 
 @torch.no_grad()
 def cutblur(
-    img_gt: Tensor, img_lq: Tensor, alpha: float = 0.7
+    img_gt: Tensor, img_lq: Tensor, alpha: float = 0.7, scale: int = 1
 ) -> tuple[Tensor, Tensor]:
     r"""CutBlur Augmentation.
 
@@ -188,12 +215,14 @@ def cutblur(
     Args:
     ----
         img_gt, img_lq (Tensor): Input images of shape (N, C, H, W).
-            Assumes same size.
+            img_gt has to be `scale` times the size of img_lq.
         alpha (float): The given max mixing ratio.
+        scale (int): Scale ratio between GT and LQ. When >1, the GT
+            patch is downscaled to fit the LQ box. Default: 1
 
     """
-    if img_gt.size() != img_lq.size():
-        msg = "img_gt and img_lq have to be the same resolution."
+    if img_gt.shape[2:] != torch.Size(s * scale for s in img_lq.shape[2:]):
+        msg = "img_gt has to be scale times the resolution of img_lq."
         raise ValueError(msg)
 
     def rand_bbox(size, lam):
@@ -204,21 +233,28 @@ def cutblur(
         cut_h = int(H * lam)
 
         # uniform
-        cx = rng.integers(W)  # type: ignore[attr-defined]
-        cy = rng.integers(H)  # type: ignore[attr-defined]
+        cx = int(rng.integers(W))  # type: ignore[attr-defined]
+        cy = int(rng.integers(H))  # type: ignore[attr-defined]
 
-        bbx1 = np.clip(cx - cut_w // 2, 0, W)
-        bby1 = np.clip(cy - cut_h // 2, 0, H)
-        bbx2 = np.clip(cx + cut_w // 2, 0, W)
-        bby2 = np.clip(cy + cut_h // 2, 0, H)
+        bbx1 = min(max(cx - cut_w // 2, 0), W)
+        bby1 = min(max(cy - cut_h // 2, 0), H)
+        bbx2 = min(max(cx + cut_w // 2, 0), W)
+        bby2 = min(max(cy + cut_h // 2, 0), H)
 
         return bbx1, bby1, bbx2, bby2
 
     lam = rng.uniform(0.2, alpha)  # type: ignore[attr-defined]
-    bbx1, bby1, bbx2, bby2 = rand_bbox(img_gt.size(), lam)
+    bbx1, bby1, bbx2, bby2 = rand_bbox(img_lq.size(), lam)
+    if bbx1 == bbx2 or bby1 == bby2:
+        return img_gt, img_lq
 
     # apply cutblur
-    img_lq[:, :, bbx1:bbx2, bby1:bby2] = img_gt[:, :, bbx1:bbx2, bby1:bby2]
+    img_gt_ = img_gt.narrow(2, bbx1 * scale, (bbx2 - bbx1) * scale).narrow(
+        3, bby1 * scale, (bby2 - bby1) * scale
+    )
+    if scale > 1:
+        img_gt_ = _resize(img_gt_, (bbx2 - bbx1, bby2 - bby1))
+    img_lq.narrow(2, bbx1, bbx2 - bbx1).narrow(3, bby1, bby2 - bby1).copy_(img_gt_)
 
     return img_gt, img_lq
 
@@ -262,68 +298,76 @@ def apply_augment(
         msg = "Augmentations need batch >1 to work."
         raise ValueError(msg)
 
+    if rng.random() < multi_prob:  # type: ignore[attr-defined]
+        num_augs = rng.integers(2, len(augs)) if len(augs) > 2 else len(augs)  # type: ignore[attr-defined]
+        # weighted sampling without replacement
+        p = np.asarray(prob, dtype=np.float64)
+        # augs switched off with a zero probability can't be drawn
+        num_augs = min(num_augs, np.count_nonzero(p))
+        aug_idx = rng.choice(len(augs), size=num_augs, replace=False, p=p / p.sum())  # type: ignore[attr-defined]
+        aug: str | set[str]
+        aug = {augs[i] for i in aug_idx}
+    else:
+        idx = random.choices(range(len(augs)), weights=prob)[0]
+        aug = augs[idx]
+
+    # cutmix and cutblur only copy boxes and work at LQ resolution,
+    # mixup and resizemix need both images at the same resolution
+    aug_set = aug if isinstance(aug, set) else {aug}
+    match_res = scale > 1 and any("mixup" in a or "resizemix" in a for a in aug_set)
+    aug_scale = 1 if match_res else scale
+
     # match resolutions
     modes = ["bilinear", "bicubic"]
-    if scale > 1:
-        img_lq = torch.clamp(
-            F.interpolate(
-                img_lq, scale_factor=scale, mode=random.choice(modes), antialias=True
-            ),
-            0,
-            1,
-        )
+    if match_res:
+        img_lq = _resize(img_lq, scale_factor=scale, mode=random.choice(modes))
 
-    if rng.random() < multi_prob:  # type: ignore[attr-defined]
-        num_augs = rng.integers(2, len(augs)) if len(augs) > 2 else len(augs)  # type: ignore[attr-defined]
-        weighted = list(zip(augs, prob, strict=False))
-        aug: str | list[str]
-        aug = []
-        for _ in range(num_augs):
-            choice = random.choices(weighted, k=1)
-            aug.append(choice[0][0])
-            weighted.remove(choice[0])
+    # one batch permutation shared by all mixing augmentations
+    mixing = any(a in {"cutmix", "mixup"} or "resizemix" in a for a in aug_set)
+    rand_index = (
+        torch.randperm(img_gt.size(0), device=img_gt.device) if mixing else None
+    )
 
+    if isinstance(aug, set):
         if "cutmix" in aug:
-            img_gt, img_lq = cutmix(img_gt, img_lq)
+            img_gt, img_lq = cutmix(
+                img_gt, img_lq, scale=aug_scale, rand_index=rand_index
+            )
         if "mixup" in aug:
-            img_gt, img_lq = mixup(img_gt, img_lq)
+            img_gt, img_lq = mixup(img_gt, img_lq, rand_index=rand_index)
         if "resizemix" in aug:
-            img_gt, img_lq = resizemix(img_gt, img_lq)
+            img_gt, img_lq = resizemix(img_gt, img_lq, rand_index=rand_index)
         #Values > 1 are intentional, designed to cover cases like stretched/squished aspect
         #ratio, etc. GT and LQ image pairs still need to be consistent with each other, however.
         if "resizemixX" in aug:
-            img_gt, img_lq = resizemix(img_gt, img_lq, [0.666, 1.5], True, False)
+            img_gt, img_lq = resizemix(
+                img_gt, img_lq, [0.666, 1.5], True, False, rand_index
+            )
         if "resizemixY" in aug:
-            img_gt, img_lq = resizemix(img_gt, img_lq, [0.666, 1.5], False, True)
+            img_gt, img_lq = resizemix(
+                img_gt, img_lq, [0.666, 1.5], False, True, rand_index
+            )
         if "cutblur" in aug:
-            img_gt, img_lq = cutblur(img_gt, img_lq)
-
-    else:
-        idx = random.choices(range(len(augs)), weights=prob)[0]
-        aug = augs[idx]
-        if "cutmix" in aug:
-            img_gt, img_lq = cutmix(img_gt, img_lq)
-        elif "mixup" in aug:
-            img_gt, img_lq = mixup(img_gt, img_lq)
-        elif "resizemix" in aug:
-            img_gt, img_lq = resizemix(img_gt, img_lq)
-        elif "resizemixX" in aug:
-            img_gt, img_lq = resizemix(img_gt, img_lq, [0.666, 1.5], True, False)
-        elif "resizemixY" in aug:
-            img_gt, img_lq = resizemix(img_gt, img_lq, [0.666, 1.5], False, True)
-        elif "cutblur" in aug:
-            img_gt, img_lq = cutblur(img_gt, img_lq)
-        else:
-            pass
+            img_gt, img_lq = cutblur(img_gt, img_lq, scale=aug_scale)
+    elif "cutmix" in aug:
+        img_gt, img_lq = cutmix(img_gt, img_lq, scale=aug_scale, rand_index=rand_index)
+    elif "mixup" in aug:
+        img_gt, img_lq = mixup(img_gt, img_lq, rand_index=rand_index)
+    elif "resizemix" in aug:
+        img_gt, img_lq = resizemix(img_gt, img_lq, rand_index=rand_index)
+    elif "resizemixX" in aug:
+        img_gt, img_lq = resizemix(
+            img_gt, img_lq, [0.666, 1.5], True, False, rand_index
+        )
+    elif "resizemixY" in aug:
+        img_gt, img_lq = resizemix(
+            img_gt, img_lq, [0.666, 1.5], False, True, rand_index
+        )
+    elif "cutblur" in aug:
+        img_gt, img_lq = cutblur(img_gt, img_lq, scale=aug_scale)
 
     # back to original resolution
-    if scale > 1:
-        img_lq = torch.clamp(
-            F.interpolate(
-                img_lq, scale_factor=1 / scale, mode="bicubic", antialias=True
-            ),
-            0,
-            1,
-        )
+    if match_res:
+        img_lq = _resize(img_lq, scale_factor=1 / scale)
 
     return img_gt, img_lq
@@ -1,4 +1,4 @@
-import math
+from functools import lru_cache
 
 import torch
 from torch import Tensor, nn
@@ -7,19 +7,23 @@ from torch.nn import functional as F
 from neosr.utils.registry import LOSS_REGISTRY
 
 
-class GaussianFilter2D(nn.Module):
-    def _get_gaussian_window1d(self) -> Tensor:
-        sigma2 = self.sigma * self.sigma
-        x = torch.arange(-(self.window_size // 2), self.window_size // 2 + 1)
-        w = torch.exp(-0.5 * x**2 / sigma2)
-        w = w / w.sum()
-        return w.reshape(1, 1, 1, self.window_size)
-
-    def _get_gaussian_window2d(self, gaussian_window_1d) -> Tensor:
-        return torch.matmul(
-            gaussian_window_1d.transpose(dim0=-1, dim1=-2), gaussian_window_1d
-        )
+@lru_cache
+def _gaussian_kernel(
+    window_size: int, sigma: float, in_channels: int
+) -> tuple[Tensor, Tensor]:
+    """Build the separable (C, 1, 1, k) and (C, 1, k, 1) gaussian kernels,
+    shared across all filter instances.
+    """
+    x = torch.arange(-(window_size // 2), window_size // 2 + 1, dtype=torch.float32)
+    w = torch.exp(-0.5 * x**2 / (sigma * sigma))
+    w = (w / w.sum()).reshape(1, 1, 1, window_size).repeat(in_channels, 1, 1, 1)
+    return (
+        w.contiguous(memory_format=torch.channels_last),
+        w.transpose(dim0=-1, dim1=-2).contiguous(memory_format=torch.channels_last),
+    )
 
+
+class GaussianFilter2D(nn.Module):
     def __init__(
         self,
         window_size: int = 11,
@@ -46,18 +50,29 @@ class GaussianFilter2D(nn.Module):
         self.padding = padding if padding is not None else window_size // 2
         self.sigma = sigma
 
-        kernel = self._get_gaussian_window1d()
-        kernel = self._get_gaussian_window2d(kernel)
+        # the gaussian is separable: a 1xk pass followed by a kx1 pass
+        # equals the kxk window at a fraction of the cost
+        window_h, window_v = _gaussian_kernel(window_size, sigma, in_channels)
         self.register_buffer(
-            name="gaussian_window", tensor=kernel.repeat(in_channels, 1, 1, 1)
+            name="gaussian_window_h", tensor=window_h, persistent=False
+        )
+        self.register_buffer(
+            name="gaussian_window_v", tensor=window_v, persistent=False
         )
 
     def forward(self, x: Tensor) -> Tensor:
+        x = F.conv2d(
+            input=x,
+            weight=self.gaussian_window_h,
+            stride=1,
+            padding=(0, self.padding),
+            groups=x.shape[1],
+        )
         return F.conv2d(
             input=x,
-            weight=self.gaussian_window,
+            weight=self.gaussian_window_v,
             stride=1,
-            padding=self.padding,
+            padding=(self.padding, 0),
             groups=x.shape[1],
         )
 
@@ -101,12 +116,19 @@ class mssim_loss(nn.Module):
         self.C2 = (K2 * L) ** 2  # equ 7 in ref1
         self.loss_weight = loss_weight
 
+        # x, y, x*x, y*y and x*y are filtered together in a single pass
         self.gaussian_filter = GaussianFilter2D(
             window_size=window_size,
-            in_channels=in_channels,
+            in_channels=5 * in_channels,
             sigma=sigma,
             padding=padding,
         )
+        # ms-ssim scale weights, equ 7 in ref2
+        self.register_buffer(
+            name="ms_weights",
+            tensor=torch.tensor((0.0448, 0.2856, 0.3001, 0.2363, 0.1333)),
+            persistent=False,
+        )
 
     @torch.amp.custom_fwd(cast_inputs=torch.float32, device_type="cuda")
     def forward(self, x: Tensor, y: Tensor) -> Tensor:
@@ -116,21 +138,26 @@ class mssim_loss(nn.Module):
         assert x.shape == y.shape, f"x: {x.shape} and y: {y.shape} must be the same"
         assert x.ndim == y.ndim == 4, f"x: {x.ndim} and y: {y.ndim} must be 4"
 
-        if x.type() != self.gaussian_filter.gaussian_window.type():
-            x = x.type_as(self.gaussian_filter.gaussian_window)
-        if y.type() != self.gaussian_filter.gaussian_window.type():
-            y = y.type_as(self.gaussian_filter.gaussian_window)
+        if x.type() != self.gaussian_filter.gaussian_window_h.type():
+            x = x.type_as(self.gaussian_filter.gaussian_window_h)
+        if y.type() != self.gaussian_filter.gaussian_window_h.type():
+            y = y.type_as(self.gaussian_filter.gaussian_window_h)
+
+        # the depthwise gaussian convs are faster in NHWC
+        x = x.contiguous(memory_format=torch.channels_last)
+        y = y.contiguous(memory_format=torch.channels_last)
 
         loss = 1.0 - self.msssim(x, y)
 
         return self.loss_weight * loss
 
     def _ssim(self, x: Tensor, y: Tensor) -> tuple[Tensor, Tensor]:
-        mu_x = self.gaussian_filter(x)  # equ 14
-        mu_y = self.gaussian_filter(y)  # equ 14
-        sigma2_x = self.gaussian_filter(x * x) - mu_x * mu_x  # equ 15
-        sigma2_y = self.gaussian_filter(y * y) - mu_y * mu_y  # equ 15
-        sigma_xy = self.gaussian_filter(x * y) - mu_x * mu_y  # equ 16
+        mu_x, mu_y, e_xx, e_yy, e_xy = self.gaussian_filter(
+            torch.cat((x, y, x * x, y * y, x * y), dim=1)
+        ).chunk(5, dim=1)  # equ 14
+        sigma2_x = e_xx - mu_x * mu_x  # equ 15
+        sigma2_y = e_yy - mu_y * mu_y  # equ 15
+        sigma_xy = e_xy - mu_x * mu_y  # equ 16
 
         A1 = 2 * mu_x * mu_y + self.C1
         A2 = 2 * sigma_xy + self.C2
@@ -145,18 +172,20 @@ class mssim_loss(nn.Module):
         return ssim, cs
 
     def msssim(self, x: Tensor, y: Tensor) -> Tensor:
+        levels = self.ms_weights.numel()
+
+        # scale-space pyramid, built once up front
+        pyramid = [(x, y)]
+        for _ in range(levels - 1):
+            padding = (x.shape[-2] % 2, x.shape[-1] % 2)  # spatial padding
+            x = F.avg_pool2d(x, kernel_size=2, stride=2, padding=padding)
+            y = F.avg_pool2d(y, kernel_size=2, stride=2, padding=padding)
+            pyramid.append((x, y))
+
         ms_components = []
-        for i, w in enumerate((0.0448, 0.2856, 0.3001, 0.2363, 0.1333)):
-            ssim, cs = self._ssim(x, y)
-            ssim = ssim.mean()
-            cs = cs.mean()
-
-            if i == 4:
-                ms_components.append(ssim**w)
-            else:
-                ms_components.append(cs**w)
-                padding = [s % 2 for s in x.shape[2:]]  # spatial padding
-                x = F.avg_pool2d(x, kernel_size=2, stride=2, padding=padding)
-                y = F.avg_pool2d(y, kernel_size=2, stride=2, padding=padding)
-
-        return math.prod(ms_components)  # equ 7 in ref2
+        for i, (x_s, y_s) in enumerate(pyramid):
+            ssim, cs = self._ssim(x_s, y_s)
+            ms_components.append(ssim.mean() if i == levels - 1 else cs.mean())
+
+        # weighted product of all scales in one pow/prod
+        return torch.stack(ms_components).pow(self.ms_weights).prod()  # equ 7 in ref2
@@ -174,6 +174,9 @@ class image(base):
             self.cri_mssim = build_loss(train_opt["mssim_opt"]).to(  # type: ignore[reportCallIssue,attr-defined]
                 self.device, memory_format=torch.channels_last, non_blocking=True
             )
+            # fuse the elementwise ssim math around the gaussian filter
+            if self.opt.get("compile", False) is True:
+                self.cri_mssim = torch.compile(self.cri_mssim, dynamic=True)  # type: ignore[assignment]
         else:
             self.cri_mssim = None
 
@@ -462,16 +465,12 @@ class image(base):
             # define gt centroid
             self.gt = ((1 - a) * self.net_output) + (a * self.gt)
             # downsampled prediction
-            self.lq_scaled = torch.clamp(
-                F.interpolate(
-                    self.net_output,
-                    scale_factor=1 / self.scale,
-                    mode="bicubic",
-                    antialias=True,
-                ),
-                0,
-                1,
-            )
+            self.lq_scaled = F.interpolate(
+                self.net_output,
+                scale_factor=1 / self.scale,
+                mode="bicubic",
+                antialias=True,
+            ).clamp_(0, 1)
             # define lq centroid
             self.output = ((1 - a) * self.lq_scaled) + (a * self.lq)
         # predict from lq centroid
@@ -509,16 +508,9 @@ class image(base):
             # lq match
             if self.match_lq_colors:
                 with torch.no_grad():
-                    self.lq_interp = torch.clamp(
-                        F.interpolate(
-                            self.lq,
-                            scale_factor=self.scale,
-                            mode="bicubic",
-                            antialias=True,
-                        ),
-                        1 / 255,
-                        1,
-                    )
+                    self.lq_interp = F.interpolate(
+                        self.lq, scale_factor=self.scale, mode="bicubic", antialias=True
+                    ).clamp_(1 / 255, 1)
 
             # wavelet guided loss
             if self.wavelet_guided and current_iter >= self.wavelet_init:
@@ -1,9 +1,12 @@
 from neosr.utils.color_util import (
     bgr2ycbcr,
+    bgr2ycbcr_pt,
     rgb2ycbcr,
     rgb2ycbcr_pt,
     ycbcr2bgr,
+    ycbcr2bgr_pt,
     ycbcr2rgb,
+    ycbcr2rgb_pt,
 )
 from neosr.utils.diffjpeg import DiffJPEG  # type: ignore[attr-defined]
 from neosr.utils.img_util import (
@@ -44,6 +47,7 @@ __all__ = [
     "Registry",
     #  color_util.py
     "bgr2ycbcr",
+    "bgr2ycbcr_pt",
     # misc.py
     "check_disk_space",
     "check_resume",
@@ -68,5 +72,7 @@ __all__ = [
     # options
     "toml_load",
     "ycbcr2bgr",
+    "ycbcr2bgr_pt",
     "ycbcr2rgb",
+    "ycbcr2rgb_pt",
 ]
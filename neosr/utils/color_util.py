@@ -1,8 +1,40 @@
+from functools import lru_cache
+
+import cv2
 import numpy as np
 import torch
 from numpy.typing import DTypeLike
 from torch import Tensor
 
+# ITU-R BT.601 coefficients, for images in range [0, 1]
+_RGB2YCBCR = np.array(
+    [[65.481, -37.797, 112.0], [128.553, -74.203, -93.786], [24.966, 112.0, -18.214]],
+    dtype=np.float32,
+)
+_BGR2YCBCR = np.ascontiguousarray(_RGB2YCBCR[::-1])
+_YCBCR_BIAS = np.array([16.0, 128.0, 128.0], dtype=np.float32)
+# inverse transform, with both [0, 1] -> [0, 255] rescales folded in
+_YCBCR2RGB = (
+    np.array(
+        [
+            [0.00456621, 0.00456621, 0.00456621],
+            [0, -0.00153632, 0.00791071],
+            [0.00625893, -0.00318811, 0],
+        ],
+        dtype=np.float32,
+    )
+    * 255.0
+    * 255.0
+)
+_YCBCR2BGR = np.ascontiguousarray(_YCBCR2RGB[:, ::-1])
+_RGB_BIAS = np.array([-222.921, 135.576, -276.836], dtype=np.float32)
+_BGR_BIAS = np.ascontiguousarray(_RGB_BIAS[::-1])
+# (out, in + 1) affine matrices for cv2.transform, bias in the last column
+_RGB2YCBCR_CV = np.hstack((_RGB2YCBCR.T, _YCBCR_BIAS[:, None]))
+_BGR2YCBCR_CV = np.hstack((_BGR2YCBCR.T, _YCBCR_BIAS[:, None]))
+_YCBCR2RGB_CV = np.hstack((_YCBCR2RGB.T, _RGB_BIAS[:, None]))
+_YCBCR2BGR_CV = np.hstack((_YCBCR2BGR.T, _BGR_BIAS[:, None]))
+
 
 def _convert_input_type_range(img: np.ndarray) -> np.ndarray:
     """Convert the type and range of the input image.
@@ -20,15 +52,15 @@ def _convert_input_type_range(img: np.ndarray) -> np.ndarray:
 
     """
     img_type = img.dtype
-    img = img.astype(np.float32)
-    if img_type == "float32" or img_type == "float16":
-        pass
-    elif img_type == "uint8":
-        img /= 255.0
-    else:
-        msg = f"The img type should be np.float32, np.float16 or np.uint8, but got {img_type}"
-        raise TypeError(msg)
-    return img
+    if img_type == np.uint8:
+        # cast and rescale in a single pass
+        return np.multiply(img, np.float32(1.0 / 255.0), dtype=np.float32)
+    if img_type in (np.float32, np.float16):
+        return img.astype(np.float32, copy=False)
+    msg = (
+        f"The img type should be np.float32, np.float16 or np.uint8, but got {img_type}"
+    )
+    raise TypeError(msg)
 
 
 def _convert_output_type_range(img: np.ndarray, dst_type: DTypeLike) -> np.ndarray:
@@ -63,10 +95,45 @@ def _convert_output_type_range(img: np.ndarray, dst_type: DTypeLike) -> np.ndarr
         msg = f"The dst_type should be np.float32, np.float16 or np.uint8, but got {dst_type}"
         raise TypeError(msg)
     if dst_type == np.uint8:
-        img = img.round()
+        np.round(img, out=img)
+        np.clip(img, 0, 255, out=img)
     else:
         img /= 255.0
-    return img.astype(dst_type)
+    return img.astype(dst_type, copy=False)
+
+
+def _transform(img: np.ndarray, mat: np.ndarray) -> np.ndarray:
+    """Apply an affine color matrix over the last axis of a (..., 3) array.
+
+    cv2.transform only takes 2D images, so any leading shape is flattened
+    and restored afterwards. Single-row matrices drop the channel axis.
+    """
+    out = cv2.transform(img.reshape(-1, 1, 3), mat)
+    if mat.shape[0] == 1:
+        return out.reshape(img.shape[:-1])
+    return out.reshape(*img.shape[:-1], mat.shape[0])
+
+
+@lru_cache
+def _coeffs_pt(
+    conversion: str, device: torch.device, dtype: torch.dtype
+) -> tuple[Tensor, Tensor]:
+    """Weight (c, d) and bias (1, d, 1, 1) of a color conversion on [0, 1]
+    tensors, cached per device and dtype so they are only transferred once.
+    """
+    weight, bias = {
+        "rgb2y": (_RGB2YCBCR[:, :1], _YCBCR_BIAS[:1]),
+        "rgb2ycbcr": (_RGB2YCBCR, _YCBCR_BIAS),
+        "bgr2y": (_BGR2YCBCR[:, :1], _YCBCR_BIAS[:1]),
+        "bgr2ycbcr": (_BGR2YCBCR, _YCBCR_BIAS),
+        "ycbcr2rgb": (_YCBCR2RGB, _RGB_BIAS),
+        "ycbcr2bgr": (_YCBCR2BGR, _BGR_BIAS),
+    }[conversion]
+    # output range [0, 255] -> [0, 1]
+    return (
+        torch.from_numpy(weight / 255.0).to(device=device, dtype=dtype),
+        torch.from_numpy(bias / 255.0).view(1, -1, 1, 1).to(device=device, dtype=dtype),
+    )
 
 
 def rgb2ycbcr(img: np.ndarray, y_only: bool = False) -> np.ndarray:
@@ -96,17 +163,7 @@ def rgb2ycbcr(img: np.ndarray, y_only: bool = False) -> np.ndarray:
     """
     img_type = img.dtype
     img = _convert_input_type_range(img)
-    if y_only:
-        out_img = np.dot(img, [65.481, 128.553, 24.966]) + 16.0
-    else:
-        out_img = np.matmul(  # noqa: RUF005
-            img,
-            [
-                [65.481, -37.797, 112.0],
-                [128.553, -74.203, -93.786],
-                [24.966, 112.0, -18.214],
-            ],
-        ) + [16, 128, 128]
+    out_img = _transform(img, _RGB2YCBCR_CV[:1] if y_only else _RGB2YCBCR_CV)
     return _convert_output_type_range(out_img, img_type)
 
 
@@ -137,17 +194,7 @@ def bgr2ycbcr(img: np.ndarray, y_only: bool = False) -> np.ndarray:
     """
     img_type = img.dtype
     img = _convert_input_type_range(img)
-    if y_only:
-        out_img = np.dot(img, [24.966, 128.553, 65.481]) + 16.0
-    else:
-        out_img = np.matmul(  # noqa: RUF005
-            img,
-            [
-                [24.966, 112.0, -18.214],
-                [128.553, -74.203, -93.786],
-                [65.481, -37.797, 112.0],
-            ],
-        ) + [16, 128, 128]
+    out_img = _transform(img, _BGR2YCBCR_CV[:1] if y_only else _BGR2YCBCR_CV)
     return _convert_output_type_range(out_img, img_type)
 
 
@@ -176,15 +223,8 @@ def ycbcr2rgb(img: np.ndarray) -> np.ndarray:
 
     """
     img_type = img.dtype
-    img = _convert_input_type_range(img) * 255
-    out_img = np.matmul(
-        img,
-        [
-            [0.00456621, 0.00456621, 0.00456621],
-            [0, -0.00153632, 0.00791071],
-            [0.00625893, -0.00318811, 0],
-        ],
-    ) * 255.0 + [-222.921, 135.576, -276.836]
+    img = _convert_input_type_range(img)
+    out_img = _transform(img, _YCBCR2RGB_CV)
     return _convert_output_type_range(out_img, img_type)
 
 
@@ -213,15 +253,8 @@ def ycbcr2bgr(img: np.ndarray) -> np.ndarray:
 
     """
     img_type = img.dtype
-    img = _convert_input_type_range(img) * 255
-    out_img = np.matmul(
-        img,
-        [
-            [0.00456621, 0.00456621, 0.00456621],
-            [0.00791071, -0.00153632, 0],
-            [0, -0.00318811, 0.00625893],
-        ],
-    ) * 255.0 + [-276.836, 135.576, -222.921]
+    img = _convert_input_type_range(img)
+    out_img = _transform(img, _YCBCR2BGR_CV)
     return _convert_output_type_range(out_img, img_type)
 
 
@@ -241,22 +274,63 @@ def rgb2ycbcr_pt(img: Tensor, y_only: bool = False) -> Tensor:
         (Tensor): converted images with the shape (n, 3/1, h, w), the range [0, 1], float.
 
     """
-    if y_only:
-        weight = torch.tensor([[65.481], [128.553], [24.966]]).to(
-            img, non_blocking=True
-        )
-        out_img = (
-            torch.matmul(img.permute(0, 2, 3, 1), weight).permute(0, 3, 1, 2) + 16.0
-        )
-    else:
-        weight = torch.tensor([
-            [65.481, -37.797, 112.0],
-            [128.553, -74.203, -93.786],
-            [24.966, 112.0, -18.214],
-        ]).to(img, non_blocking=True)
-        bias = torch.tensor([16, 128, 128]).view(1, 3, 1, 1).to(img, non_blocking=True)
-        out_img = (
-            torch.matmul(img.permute(0, 2, 3, 1), weight).permute(0, 3, 1, 2) + bias
-        )
-
-    return out_img / 255.0
+    conversion = "rgb2y" if y_only else "rgb2ycbcr"
+    weight, bias = _coeffs_pt(conversion, img.device, img.dtype)
+    return torch.einsum("nchw,cd->ndhw", img, weight) + bias
+
+
+def bgr2ycbcr_pt(img: Tensor, y_only: bool = False) -> Tensor:
+    """Convert BGR images to YCbCr images (PyTorch version).
+
+    The bgr version of rgb2ycbcr_pt.
+
+    Args:
+    ----
+        img (Tensor): Images with shape (n, 3, h, w), the range [0, 1], float, BGR format.
+         y_only (bool): Whether to only return Y channel. Default: False.
+
+    Returns:
+    -------
+        (Tensor): converted images with the shape (n, 3/1, h, w), the range [0, 1], float.
+
+    """
+    conversion = "bgr2y" if y_only else "bgr2ycbcr"
+    weight, bias = _coeffs_pt(conversion, img.device, img.dtype)
+    return torch.einsum("nchw,cd->ndhw", img, weight) + bias
+
+
+def ycbcr2rgb_pt(img: Tensor) -> Tensor:
+    """Convert YCbCr images to RGB images (PyTorch version).
+
+    It implements the ITU-R BT.601 conversion for standard-definition television. See more details in
+    https://en.wikipedia.org/wiki/YCbCr#ITU-R_BT.601_conversion.
+
+    Args:
+    ----
+        img (Tensor): Images with shape (n, 3, h, w), the range [0, 1], float.
+
+    Returns:
+    -------
+        (Tensor): converted images with the shape (n, 3, h, w), the range [0, 1], float, RGB format.
+
+    """
+    weight, bias = _coeffs_pt("ycbcr2rgb", img.device, img.dtype)
+    return torch.einsum("nchw,cd->ndhw", img, weight) + bias
+
+
+def ycbcr2bgr_pt(img: Tensor) -> Tensor:
+    """Convert YCbCr images to BGR images (PyTorch version).
+
+    The bgr version of ycbcr2rgb_pt.
+
+    Args:
+    ----
+        img (Tensor): Images with shape (n, 3, h, w), the range [0, 1], float.
+
+    Returns:
+    -------
+        (Tensor): converted images with the shape (n, 3, h, w), the range [0, 1], float, BGR format.
+
+    """
+    weight, bias = _coeffs_pt("ycbcr2bgr", img.device, img.dtype)
+    return torch.einsum("nchw,cd->ndhw", img, weight) + bias